@@ -0,0 +1,255 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process LRU cache with TTL and entry-count / byte-size bounds"""
+
+    def __init__(self, max_entries=1024, ttl=None, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value; ttl can only shorten the cache's own TTL for this entry"""
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if ttl is None or (self.ttl and self.ttl < ttl):
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def peek(self, key, default=None):
+        """Like get, but leaves the hit/miss counters and LRU order alone"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+                return default
+            return entry[0]
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class NearDuplicateCache:
+    """Cache keyed by a 64-bit perceptual hash plus a tag.
+
+    A lookup that misses exactly falls back to the closest stored hash with the
+    same tag within max_distance bits (Hamming distance).
+    """
+
+    def __init__(self, max_entries=1024, ttl=None, max_distance=0):
+        self.entries = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.max_distance = max_distance
+        self.near_hits = 0
+
+    def get(self, phash, tag=""):
+        value = self.entries.get((phash, tag))
+        if value is not None or self.max_distance <= 0:
+            return value
+
+        best_key, best_distance = None, self.max_distance + 1
+        for key in self.entries.keys():
+            other, other_tag = key
+            if other_tag == tag:
+                distance = (phash ^ other).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+        if best_key is None:
+            return None
+        value = self.entries.get(best_key)
+        if value is not None:
+            # The exact lookup above was counted as a miss
+            self.entries.misses -= 1
+            self.near_hits += 1
+        return value
+
+    def set(self, phash, value, tag=""):
+        self.entries.set((phash, tag), value)
+
+    def stats(self):
+        stats = self.entries.stats()
+        stats["near_hits"] = self.near_hits
+        stats["max_distance"] = self.max_distance
+        return stats
+
+
+class SqliteStore:
+    """On-disk cache tier that survives restarts; values are stored as JSON.
+
+    Calls are blocking, so async callers go through TieredCache, which runs
+    them in a worker thread. Read recency is buffered and written with the
+    next set, and LRU eviction runs every evict_every writes.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=None, evict_every=100):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_every = evict_every
+        self._writes = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        value, _ = self.get_with_ttl(key)
+        return value
+
+    def get_with_ttl(self, key):
+        """(value, seconds until it expires); (None, None) on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                # Expired rows are removed by the next eviction pass
+                return None, None
+            self._touched[key] = now
+        return json.loads(value), (expires_at - now if expires_at is not None else None)
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            if self._touched:
+                self._conn.executemany(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, touched) for touched, accessed_at in self._touched.items()],
+                )
+                self._touched.clear()
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        )
+        # Both statements walk the accessed_at index instead of scanning the table
+        self._conn.execute(
+            "DELETE FROM cache WHERE accessed_at < "
+            "(SELECT accessed_at FROM cache ORDER BY accessed_at DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries - 1,),
+        )
+
+
+class TieredCache:
+    """LRU memory tier in front of an optional on-disk tier.
+
+    get/set are coroutines: the memory tier is used inline and the disk
+    tier runs in a worker thread so sqlite never blocks the event loop.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.disk_hits = 0
+
+    async def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        value, ttl = await asyncio.to_thread(self.disk.get_with_ttl, key)
+        if value is not None:
+            self.disk_hits += 1
+            # Promote with the disk row's remaining lifetime, not a fresh TTL
+            self.memory.set(key, value, ttl=ttl)
+        return value
+
+    async def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def stats(self):
+        stats = self.memory.stats()
+        # Memory misses that the disk tier served are hits overall
+        lookups = stats["hits"] + stats["misses"]
+        stats["memory_hits"] = stats["hits"]
+        stats["hits"] += self.disk_hits
+        stats["misses"] -= self.disk_hits
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["disk_enabled"] = self.disk is not None
+        stats["disk_hits"] = self.disk_hits
+        return stats
@@ -0,0 +1,143 @@
+import asyncio
+import functools
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+
+from app.metrics import STAGE_SECONDS
+
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))
+JPEG_QUALITY = min(max(int(os.getenv("IMAGE_JPEG_QUALITY", "85")), 30), 95)
+READ_CHUNK_SIZE = 64 * 1024
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads scale here
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    thread_name_prefix="image-preprocess",
+)
+
+# Formats Gemini accepts as-is; anything else sniffed below is always re-encoded
+GEMINI_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+
+# Magic-number prefixes of the formats we can sniff
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+stats = {"images": 0, "original_bytes": 0, "processed_bytes": 0}
+
+
+async def read_upload(file, max_bytes=MAX_UPLOAD_BYTES):
+    """Read an UploadFile in chunks, rejecting it as soon as it exceeds max_bytes"""
+    buffer = bytearray()
+    while chunk := await file.read(READ_CHUNK_SIZE):
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {max_bytes} bytes")
+    return bytes(buffer)
+
+
+def sniff_mime(data):
+    """Detect the real image type from its leading bytes; None if unsupported"""
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypheif"):
+        return "image/heic"
+    return None
+
+
+def dhash(image, size=8):
+    """64-bit difference hash: stable across re-compression and small resizes"""
+    pixels = list(image.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def downscale_and_encode(data, max_dimension=MAX_DIMENSION, quality=JPEG_QUALITY, keep_original=True):
+    """Fit the image within max_dimension and re-encode it as JPEG.
+
+    Returns (bytes, mime_type, dhash). When keep_original is true, the
+    original bytes are kept (with a None mime type) if the image already fits
+    and re-encoding would not make it smaller.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image_hash = dhash(image)
+        resized = max(image.size) > max_dimension
+        if resized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    encoded = output.getvalue()
+    if keep_original and not resized and len(encoded) >= len(data):
+        return data, None, image_hash
+    return encoded, "image/jpeg", image_hash
+
+
+async def preprocess_upload(file):
+    """Read, sniff, downscale and re-encode an uploaded image.
+
+    Returns (bytes, mime_type, dhash, report) where dhash is None if Pillow
+    could not decode the image, and report lists bytes saved and the time
+    spent in each stage.
+    """
+    timings = {}
+    started = time.perf_counter()
+    data = await read_upload(file)
+    timings["read_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    mime = sniff_mime(data)
+    timings["sniff_ms"] = (time.perf_counter() - started) * 1000
+    if mime is None:
+        raise HTTPException(status_code=415, detail="Unsupported image format")
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    accepted = mime in GEMINI_IMAGE_TYPES
+    try:
+        processed, new_mime, image_hash = await loop.run_in_executor(
+            _executor, functools.partial(downscale_and_encode, data, keep_original=accepted)
+        )
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=413, detail="Image dimensions are too large")
+    except OSError:
+        if not accepted:
+            raise HTTPException(status_code=415, detail="Unsupported image format")
+        # Pillow cannot decode it (e.g. HEIC without a plugin); send it as-is
+        processed, new_mime, image_hash = data, None, None
+    timings["resize_encode_ms"] = (time.perf_counter() - started) * 1000
+
+    stats["images"] += 1
+    stats["original_bytes"] += len(data)
+    stats["processed_bytes"] += len(processed)
+
+    STAGE_SECONDS.observe(timings["read_ms"] / 1000, "upload_read")
+    STAGE_SECONDS.observe(timings["sniff_ms"] / 1000, "image_sniff")
+    STAGE_SECONDS.observe(timings["resize_encode_ms"] / 1000, "image_resize_encode")
+
+    report = {
+        "original_bytes": len(data),
+        "processed_bytes": len(processed),
+        "bytes_saved": len(data) - len(processed),
+        "timings_ms": {stage: round(ms, 2) for stage, ms in timings.items()},
+    }
+    return processed, new_mime or mime, image_hash, report
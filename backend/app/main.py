@@ -1,15 +1,51 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from app.genai_service import generate_recipe, analyze_and_generate_recipe_from_image
-from app.pdf_generator import generate_recipe_pdf
-from fastapi.responses import FileResponse
-import uuid
+from app.genai_service import generate_recipe, generate_recipe_batch, iter_recipe_batch, stream_recipe, analyze_and_generate_recipe_from_image, recipe_cache, recipe_flight, image_flight, image_nutrition_cache, image_recipe_cache, image_analysis_latency, gemini_client
+from app.pdf_generator import generate_recipe_pdf, cleanup_generated, recipe_pdf_key
+from app.cache import LRUCache
+from app import image_preprocessing
+from app.middleware import BodySizeLimitMiddleware, MetricsMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from app.resilience import UpstreamUnavailableError
+from app import metrics
+from app.metrics import observe_request_parse
+import json
+import math
 import os
+import re
 from pathlib import Path
 
 app = FastAPI()
 
+# PDFs are served from memory; set PDF_OUTPUT_DIR to also keep copies on disk
+PDF_OUTPUT_DIR = os.getenv("PDF_OUTPUT_DIR")
+PDF_RETENTION_SECONDS = float(os.getenv("PDF_RETENTION_SECONDS", "3600"))
+PDF_MAX_FILES = int(os.getenv("PDF_MAX_FILES", "500"))
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+# Rendered PDFs keyed by content hash as (bytes, filename), bounded by total bytes
+PDF_CACHE_BYTES = int(os.getenv("PDF_CACHE_BYTES", str(64 * 1024 * 1024)))
+PDF_MAX_AGE = int(os.getenv("PDF_MAX_AGE", "86400"))
+pdf_cache = LRUCache(max_entries=10000, max_bytes=PDF_CACHE_BYTES, sizeof=lambda entry: len(entry[0]))
+
+UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z-]")
+
+def pdf_filename(language, pdf_key):
+    """ASCII-only name, safe in Content-Disposition and as a path under PDF_OUTPUT_DIR"""
+    language = UNSAFE_FILENAME_RE.sub("", str(language))[:16] or "en"
+    return f"recipe_{language}_{pdf_key[:12]}.pdf"
+
+# Multipart framing adds a little on top of the image itself;
+# added before CORS so CORS stays outermost and 413s carry its headers
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=image_preprocessing.MAX_UPLOAD_BYTES + 64 * 1024,
+    paths=["/generate-from-image"],
+)
+
 # CORS Configuration
 origins = ["http://localhost:5173"]
 app.add_middleware(
@@ -18,47 +54,191 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Optional sampling profiler: profile PROFILE_SAMPLE_RATE of requests with pyinstrument
+# and keep the report for those slower than PROFILE_SLOW_MS
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+Profiler = None
+if PROFILE_SAMPLE_RATE > 0:
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        print("PROFILE_SAMPLE_RATE is set but pyinstrument is not installed; profiling disabled")
+
+# Added last so it is outermost and also times CORS and the upload limit
+app.add_middleware(
+    MetricsMiddleware,
+    routes=app.routes,
+    profiler_factory=(lambda: Profiler(async_mode="enabled")) if Profiler is not None else None,
+    sample_rate=PROFILE_SAMPLE_RATE,
+    slow_ms=PROFILE_SLOW_MS,
+    profile_dir=PROFILE_DIR,
+)
+
+@app.exception_handler(UpstreamUnavailableError)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailableError):
+    headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
 class RecipeRequest(BaseModel):
     ingredients: str
     language: str = "en"
 
+class BatchRecipeRequest(BaseModel):
+    items: list[RecipeRequest]
+    stream: bool = False
+
 @app.post("/generate")
 async def generate(request: RecipeRequest):
-    return generate_recipe(request.ingredients, request.language)
+    observe_request_parse()
+    return await generate_recipe(request.ingredients, request.language)
+
+@app.post("/generate/stream")
+async def generate_stream(request: RecipeRequest):
+    observe_request_parse()
+    # Server-Sent Events: one "data:" event per chunk, then a "done" event
+    async def events():
+        try:
+            async for chunk in stream_recipe(request.ingredients, request.language):
+                yield f"data: {json.dumps({'text': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'language': request.language})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/generate/batch")
+async def generate_batch(request: BatchRecipeRequest):
+    observe_request_parse()
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items")
+    items = [item.model_dump() for item in request.items]
+
+    if not request.stream:
+        return {"results": await generate_recipe_batch(items)}
+
+    # NDJSON: one line per item as it finishes, tagged with its input index
+    async def lines():
+        async for index, result in iter_recipe_batch(items):
+            yield json.dumps({"index": index, **result}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.post("/generate-from-image")
 async def generate_from_image(
     file: UploadFile = File(...),
     language: str = "en"
 ):
+    observe_request_parse()
     return await analyze_and_generate_recipe_from_image(file, language)
 
+@app.get("/stats")
+async def stats():
+    return {
+        "gemini": gemini_client.stats(),
+        "recipe_cache": recipe_cache.stats(),
+        "recipe_flight": recipe_flight.stats(),
+        "image_flight": image_flight.stats(),
+        "image_nutrition_cache": image_nutrition_cache.stats(),
+        "image_recipe_cache": image_recipe_cache.stats(),
+        "image_analysis_latency": {mode: window.stats() for mode, window in image_analysis_latency.items()},
+        "pdf_cache": pdf_cache.stats(),
+        "image_preprocessing": image_preprocessing.stats,
+    }
+
+def _cache_metric_lines():
+    caches = {
+        "recipe": recipe_cache.stats(),
+        "image_nutrition": image_nutrition_cache.stats(),
+        "image_recipe": image_recipe_cache.stats(),
+        "pdf": pdf_cache.stats(),
+    }
+    lines = []
+    for metric, key, kind in (
+        ("recipe_cache_hits_total", "hits", "counter"),
+        ("recipe_cache_misses_total", "misses", "counter"),
+        ("recipe_cache_entries", "entries", "gauge"),
+        ("recipe_cache_hit_ratio", "hit_rate", "gauge"),
+    ):
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(f'{metric}{{cache="{name}"}} {stats[key]}' for name, stats in caches.items())
+
+    flights = {"recipe": recipe_flight.stats(), "image": image_flight.stats()}
+    lines.append("# TYPE recipe_singleflight_collapsed_total counter")
+    lines.extend(f'recipe_singleflight_collapsed_total{{flight="{name}"}} {stats["collapsed"]}' for name, stats in flights.items())
+
+    gemini = gemini_client.stats()
+    lines.append("# TYPE recipe_gemini_calls_total counter")
+    lines.extend(
+        f'recipe_gemini_calls_total{{outcome="{key}"}} {gemini[key]}'
+        for key in ("calls", "retries", "timeouts", "failures", "rejected")
+    )
+    lines.append("# TYPE recipe_gemini_breaker_open gauge")
+    lines.append(f"recipe_gemini_breaker_open {int(gemini['breaker_state'] != 'closed')}")
+    return lines
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(_cache_metric_lines()), media_type="text/plain; version=0.0.4")
+
 @app.post("/download-recipe-pdf")
-async def download_recipe_pdf(recipe_data: dict):
+async def download_recipe_pdf(recipe_data: dict, request: Request):
+    """Render (or reuse) the PDF and redirect to its content-addressed GET URL"""
+    observe_request_parse()
+    output_path = None
     try:
-        # Create a unique filename
-        file_id = str(uuid.uuid4())
-        filename = f"recipe_{recipe_data.get('language', 'en')}_{file_id}.pdf"
-        
-        # Create output directory if it doesn't exist
-        output_dir = Path("generated")
-        output_dir.mkdir(exist_ok=True)
-        output_path = output_dir / filename
-        
-        # Generate the PDF
-        generate_recipe_pdf(recipe_data, str(output_path))
-        
-        # Verify the file was created
-        if not output_path.exists():
-            raise HTTPException(status_code=500, detail="PDF generation failed")
-        
-        # Return the file response
-        return FileResponse(
-            path=output_path,
-            filename=filename,
-            media_type="application/pdf"
-        )
+        pdf_key = recipe_pdf_key(recipe_data)
+        if pdf_cache.get(pdf_key) is None:
+            filename = pdf_filename(recipe_data.get("language", "en"), pdf_key)
+
+            # Optional on-disk copy, pruned by the retention policy
+            if PDF_OUTPUT_DIR:
+                output_dir = Path(PDF_OUTPUT_DIR)
+                output_dir.mkdir(parents=True, exist_ok=True)
+                output_path = output_dir / filename
+
+            # FPDF layout is CPU-bound, so render off the event loop
+            pdf_bytes = await run_in_threadpool(generate_recipe_pdf, recipe_data, output_path)
+            pdf_cache.set(pdf_key, (pdf_bytes, filename))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if output_path:
+        # Best effort: the PDF is already rendered and cached, so never fail the request here
+        try:
+            await run_in_threadpool(cleanup_generated, output_dir, PDF_RETENTION_SECONDS, PDF_MAX_FILES)
+        except OSError as e:
+            print(f"PDF cleanup failed: {e}")
+
+    # 303 makes clients follow up with a GET, which browsers can cache and revalidate
+    return RedirectResponse(request.url_for("recipe_pdf", pdf_key=pdf_key), status_code=303)
+
+@app.get("/recipe-pdf/{pdf_key}", name="recipe_pdf")
+async def recipe_pdf(pdf_key: str, request: Request):
+    """Serve a rendered PDF by content hash; shareable and cacheable"""
+    etag = f'"{pdf_key}"'
+    cache_headers = {"ETag": etag, "Cache-Control": f"public, max-age={PDF_MAX_AGE}"}
+
+    # The client already holds this exact PDF; "*" only matches a PDF we still have
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or (
+        if_none_match.strip() == "*" and pdf_cache.peek(pdf_key) is not None
+    ):
+        return Response(status_code=304, headers=cache_headers)
+
+    # Hits and misses are counted once, by the POST that decides whether to render
+    entry = pdf_cache.peek(pdf_key)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="PDF not found or expired; render it again with POST /download-recipe-pdf")
+    pdf_bytes, filename = entry
+    headers = {**cache_headers, "Content-Disposition": f'attachment; filename="{filename}"'}
+    return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
@@ -0,0 +1,154 @@
+import json
+import random
+import time
+from pathlib import Path
+
+from fastapi import HTTPException
+from starlette.routing import Match
+
+from app import metrics
+
+
+class BodySizeLimitMiddleware:
+    """Reject request bodies over max_bytes on the given paths before they are parsed.
+
+    A declared Content-Length over the limit is refused without reading the
+    body; otherwise the body is counted as it streams in and the request is
+    aborted with 413 as soon as it crosses the limit, so multipart parsing
+    never spools an oversized upload to disk.
+    """
+
+    def __init__(self, app, max_bytes, paths):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(send)
+
+    def _detail(self):
+        return f"Request body exceeds {self.max_bytes} bytes"
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": self._detail()}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class MetricsMiddleware:
+    """Time each HTTP request until its last body chunk has been sent.
+
+    Unlike an @app.middleware("http") wrapper, which returns as soon as the
+    response headers are ready, this keeps the in-flight gauge, the latency
+    histogram and the optional profiler running until streamed responses
+    (SSE, NDJSON) have finished. Requests are labelled by route template, and
+    unmatched URLs by "other" to bound metric cardinality.
+    """
+
+    def __init__(self, app, routes, profiler_factory=None, sample_rate=0.0,
+                 slow_ms=2000.0, profile_dir="profiles"):
+        self.app = app
+        self.routes = routes
+        self.profiler_factory = profiler_factory
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.profile_dir = Path(profile_dir)
+
+    def _path_label(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = self._path_label(scope)
+        started = time.perf_counter()
+        metrics.request_started.set(started)
+        profiler = None
+        if self.profiler_factory is not None and random.random() < self.sample_rate:
+            profiler = self.profiler_factory()
+            profiler.start()
+
+        status = 500
+        finished = False
+        metrics.IN_FLIGHT.inc(1, path)
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            metrics.IN_FLIGHT.dec(1, path)
+            elapsed = time.perf_counter() - started
+            metrics.REQUEST_SECONDS.observe(elapsed, path, str(status))
+            if profiler is not None:
+                profiler.stop()
+                if elapsed * 1000 >= self.slow_ms:
+                    self._save_profile(profiler, path, elapsed)
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            # Errors and client disconnects end the request without a final body chunk
+            finish()
+
+    def _save_profile(self, profiler, path, elapsed):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        name = path.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        report = self.profile_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{int(elapsed * 1000)}ms.html"
+        report.write_text(profiler.output_html(), encoding="utf-8")
@@ -1,18 +1,46 @@
 from fpdf import FPDF
 from datetime import datetime
+from pathlib import Path
+import hashlib
 import re
+import time
+from app.metrics import stage
+
+# Bump whenever the layout below changes so cached PDFs are not reused
+PDF_LAYOUT_VERSION = "2"
+
+HEADER_RE = re.compile(r'^#+\s*', re.MULTILINE)
+LIST_MARKER_RE = re.compile(r'^\s*[\*\-\+] ', re.MULTILINE)
+SECTION_SPLIT_RE = re.compile(r'\n\s*\n')
 
 def clean_markdown(text):
     """Remove markdown formatting while preserving structure"""
     # Remove headers
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
+    text = HEADER_RE.sub('', text)
     # Remove bold/italic
     text = text.replace('**', '').replace('__', '')
-    # Remove lists markers
-    text = re.sub(r'^\s*[\*\-\+] ', '• ', text, flags=re.MULTILINE)
+    # Remove lists markers (the core PDF fonts are latin-1, which has no "•")
+    text = LIST_MARKER_RE.sub('\u00b7 ', text)
     return text.strip()
 
-def generate_recipe_pdf(recipe_data, output_path):
+def recipe_pdf_key(recipe_data):
+    """Content hash of (recipe text, language, layout version)"""
+    digest = hashlib.sha256()
+    for part in (recipe_data.get("recipe", ""), recipe_data.get("language", "en"), PDF_LAYOUT_VERSION):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def generate_recipe_pdf(recipe_data, output_path=None):
+    """Render the recipe to PDF bytes; also write them to output_path if given"""
+    with stage("pdf_layout"):
+        pdf_bytes = _render_pdf(recipe_data)
+    if output_path:
+        with stage("pdf_write"):
+            Path(output_path).write_bytes(pdf_bytes)
+    return pdf_bytes
+
+def _render_pdf(recipe_data):
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -32,7 +60,7 @@ def generate_recipe_pdf(recipe_data, output_path):
     cleaned_text = clean_markdown(recipe_text)
     
     # Split into sections
-    sections = re.split(r'\n\s*\n', cleaned_text)
+    sections = SECTION_SPLIT_RE.split(cleaned_text)
     
     for section in sections:
         if not section.strip():
@@ -56,4 +84,19 @@ def generate_recipe_pdf(recipe_data, output_path):
     pdf.set_font("Arial", "I", 8)
     pdf.cell(0, 10, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 0, 0, "C")
     
-    pdf.output(output_path)
\ No newline at end of file
+    return bytes(pdf.output())
+
+def cleanup_generated(output_dir, max_age_seconds, max_files):
+    """Apply the retention policy to on-disk PDFs: drop expired files, then the oldest beyond max_files"""
+    files = []
+    for path in Path(output_dir).glob("recipe_*.pdf"):
+        try:
+            files.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            # Removed by a concurrent cleanup after it was listed
+            continue
+    files.sort(reverse=True)
+    cutoff = time.time() - max_age_seconds
+    for index, (mtime, path) in enumerate(files):
+        if index >= max_files or mtime < cutoff:
+            path.unlink(missing_ok=True)
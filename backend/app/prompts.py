@@ -0,0 +1,39 @@
+import json
+import os
+from pathlib import Path
+
+DEFAULT_PROMPTS_FILE = Path(__file__).with_name("prompts.json")
+DEFAULT_LANGUAGE = "en"
+
+
+def load_prompts(*paths):
+    """Build the {(task, language): template} registry from JSON files.
+
+    Each file maps task -> language -> template; later files add to or
+    override earlier ones.
+    """
+    registry = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for task, templates in json.load(f).items():
+                for language, template in templates.items():
+                    registry[(task, language)] = template
+    return registry
+
+
+# Built once per process; set PROMPTS_FILE to layer extra languages or overrides on top
+PROMPTS = load_prompts(
+    DEFAULT_PROMPTS_FILE, *filter(None, [os.getenv("PROMPTS_FILE")])
+)
+
+
+def get_prompt(task, language=DEFAULT_LANGUAGE):
+    """Template for (task, language), falling back to the default language"""
+    template = PROMPTS.get((task, language))
+    if template is None:
+        template = PROMPTS[(task, DEFAULT_LANGUAGE)]
+    return template
+
+
+def render_prompt(task, language=DEFAULT_LANGUAGE, **values):
+    return get_prompt(task, language).format(**values)
@@ -0,0 +1,193 @@
+import asyncio
+import random
+import time
+
+# HTTP-style status codes worth retrying (google.api_core errors expose them as .code)
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class UpstreamUnavailableError(Exception):
+    """Gemini could not serve the call; retry_after hints when to try again"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    pass
+
+
+def is_retryable(exc):
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return getattr(exc, "code", None) in RETRYABLE_CODES
+
+
+def is_rate_limited(exc):
+    return getattr(exc, "code", None) == 429
+
+
+class TokenBucket:
+    """Token-bucket limiter that halves its rate on 429s and creeps back up on success"""
+
+    def __init__(self, rate, capacity, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 20
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def penalize(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def reward(self):
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and fails fast until
+    reset_timeout has passed, then lets one probe call through per reset_timeout."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if remaining > 0:
+            raise CircuitOpenError("Gemini circuit breaker is open", retry_after=remaining)
+        # Let this call probe the upstream; others keep failing fast meanwhile
+        self.state = "half_open"
+        self._opened_at = time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.state = "closed"
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class ResilientClient:
+    """Guards generate_content_async with a concurrency cap, token bucket,
+    per-call timeout, jittered exponential retries and a circuit breaker.
+
+    model_factory returns the object to call, so a local fake model can be
+    swapped in for tests and benchmarks.
+    """
+
+    def __init__(self, model_factory, limiter, breaker, max_concurrency=32,
+                 timeout=60.0, max_retries=3, base_delay=0.5, max_delay=8.0):
+        self.model_factory = model_factory
+        self.limiter = limiter
+        self.breaker = breaker
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.counters = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "rejected": 0}
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _attempt(self, call):
+        """Run call() with retries; call must start a fresh upstream request each time"""
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.counters["rejected"] += 1
+                raise
+            await self.limiter.acquire()
+            try:
+                async with self._slots:
+                    result = await asyncio.wait_for(call(), self.timeout)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.counters["timeouts"] += 1
+                if not is_retryable(e):
+                    # The upstream answered (e.g. a 400), so it is reachable:
+                    # a half-open probe has succeeded
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if is_rate_limited(e):
+                    self.limiter.penalize()
+                if attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise UpstreamUnavailableError(f"Gemini call failed: {e!r}") from e
+                self.counters["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self.limiter.reward()
+            return result
+
+    async def generate(self, contents, **kwargs):
+        return await self._attempt(
+            lambda: self.model_factory().generate_content_async(contents, **kwargs)
+        )
+
+    async def stream(self, contents, **kwargs):
+        """Yield response chunks (text plus usage_metadata); only the opening
+        request is retried, and each chunk must arrive within the timeout"""
+        response = await self._attempt(
+            lambda: self.model_factory().generate_content_async(contents, stream=True, **kwargs)
+        )
+        chunks = response.__aiter__()
+        async with self._slots:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError as e:
+                    self.counters["timeouts"] += 1
+                    self.counters["failures"] += 1
+                    self.breaker.record_failure()
+                    raise UpstreamUnavailableError("Gemini stream stalled") from e
+                except Exception as e:
+                    # Chunks already sent cannot be replayed, so mid-stream errors are not retried
+                    if not is_retryable(e):
+                        raise
+                    self.counters["failures"] += 1
+                    self.breaker.record_failure()
+                    raise UpstreamUnavailableError(f"Gemini stream failed: {e!r}") from e
+                yield chunk
+
+    def stats(self):
+        return {
+            **self.counters,
+            "breaker_state": self.breaker.state,
+            "rate_limit_per_sec": round(self.limiter.rate, 3),
+        }
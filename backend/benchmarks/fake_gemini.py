@@ -0,0 +1,96 @@
+"""Configurable stand-in for genai.GenerativeModel, so benchmarks cost no API money.
+
+    from benchmarks.fake_gemini import FakeModel, install
+    install(FakeModel(latency=0.8, error_rate=0.02))
+"""
+import asyncio
+import json
+import random
+import types
+
+from app import genai_service
+from app.resilience import TokenBucket
+
+
+class FakeUpstreamError(Exception):
+    """Looks like a google.api_core error to the resilience layer"""
+
+    def __init__(self, code=503):
+        super().__init__(f"fake upstream error {code}")
+        self.code = code
+
+
+def fake_recipe(sections=6, lines_per_section=8):
+    parts = ["# Fake Recipe", "A recipe produced by the benchmark fake."]
+    for section in range(sections):
+        parts.append(f"## Section {section + 1}")
+        parts.extend(
+            f"- **Step {line + 1}**: stir the __ingredients__ for {line + 2} minutes"
+            for line in range(lines_per_section)
+        )
+        parts.append("")
+    return "\n".join(parts)
+
+
+class FakeModel:
+    """Answers generate_content_async after a simulated latency.
+
+    latency/jitter are seconds, error_rate is the chance of a retryable 503,
+    and streamed responses are split into chunks of chunk_size characters
+    arriving token_delay seconds apart.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.1, error_rate=0.0, token_delay=0.01,
+                 chunk_size=40, recipe_sections=6, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.token_delay = token_delay
+        self.chunk_size = chunk_size
+        self.recipe = fake_recipe(recipe_sections)
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.stream_calls = 0
+
+    def _reply(self, contents, generation_config):
+        if generation_config is not None:
+            return json.dumps({
+                "ingredients": ["tomato", "onion", "garlic"],
+                "nutrition": {"calories": "320", "protein": "8g", "carbs": "40g", "fats": "12g"},
+                "recipe": self.recipe,
+            })
+        if isinstance(contents, list):
+            return '```json\n{"ingredients": ["tomato", "onion", "garlic"], "calories": 320}\n```'
+        return self.recipe
+
+    async def generate_content_async(self, contents, stream=False, generation_config=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        if self.random.random() < self.error_rate:
+            raise FakeUpstreamError(self.random.choice([429, 503]))
+        text = self._reply(contents, generation_config)
+        if stream:
+            self.stream_calls += 1
+            return self._stream(text)
+        return types.SimpleNamespace(text=text, usage_metadata=self._usage(text))
+
+    @staticmethod
+    def _usage(text):
+        # Roughly four characters per token, like Gemini's English text
+        return types.SimpleNamespace(prompt_token_count=50, candidates_token_count=len(text) // 4)
+
+    async def _stream(self, text):
+        for start in range(0, len(text), self.chunk_size):
+            await asyncio.sleep(self.token_delay)
+            end = start + self.chunk_size
+            # Like Gemini, the final chunk carries the usage totals
+            usage = self._usage(text) if end >= len(text) else None
+            yield types.SimpleNamespace(text=text[start:end], usage_metadata=usage)
+
+
+def install(fake, unthrottled=True):
+    """Swap genai_service.model for the fake; optionally lift the quota limiter"""
+    genai_service.model = fake
+    if unthrottled:
+        genai_service.gemini_client.limiter = TokenBucket(rate=1e6, capacity=1e6)
+    return fake
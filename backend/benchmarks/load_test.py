@@ -0,0 +1,186 @@
+"""Drive the FastAPI app against a fake Gemini backend and report latency/throughput.
+
+Run from the backend directory (needs httpx and Pillow):
+
+    python -m benchmarks.load_test --endpoint all --requests 500 --concurrency 50 --latency 0.8
+
+Besides total latency, each report has ttfb_* figures: time until the first
+response body chunk, which for /generate/stream is the first SSE event.
+"""
+import argparse
+import asyncio
+import io
+import random
+import resource
+import sys
+import time
+
+import httpx
+from PIL import Image
+
+from app.main import app
+from app.metrics import LatencyWindow
+from benchmarks.fake_gemini import FakeModel, fake_recipe, install
+
+INGREDIENTS = [
+    "tomato", "onion", "garlic", "rice", "chicken", "paneer", "spinach", "potato",
+    "egg", "lentils", "ginger", "chili", "coriander", "butter", "flour", "milk",
+]
+
+# Large noise images are slow to build, so image runs cycle through at most this many
+MAX_SAMPLE_IMAGES = 32
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def sample_images(count, size):
+    images = []
+    rng = random.Random(7)
+    for _ in range(count):
+        image = Image.effect_noise(size, rng.uniform(40, 120)).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=92)
+        images.append(buffer.getvalue())
+    return images
+
+
+class FirstByteRecorder:
+    """ASGI wrapper noting when each request's first non-empty body chunk is sent.
+
+    httpx's ASGITransport only returns once the app has finished, so time to
+    first byte (for SSE, the first event) has to be taken on the app side.
+    Requests are matched by their x-bench-id header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.first_byte = {}
+
+    async def __call__(self, scope, receive, send):
+        request_id = dict(scope.get("headers", [])).get(b"x-bench-id")
+        if request_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def recording_send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                self.first_byte.setdefault(request_id.decode(), time.perf_counter())
+            await send(message)
+
+        await self.app(scope, receive, recording_send)
+
+
+def request_factory(endpoint, args):
+    # Seeded per endpoint and tagged with the endpoint name, so e.g. the stream
+    # run never hits recipes the generate run just cached
+    rng = random.Random(f"{args.seed}:{endpoint}")
+    combos = [
+        ", ".join(rng.sample(INGREDIENTS, 4) + [f"{endpoint} special {i}"])
+        for i in range(args.distinct)
+    ]
+    images = sample_images(min(args.distinct, MAX_SAMPLE_IMAGES), (args.image_size, args.image_size)) if endpoint == "image" else []
+    recipe = fake_recipe(args.recipe_sections)
+
+    def build(index):
+        if endpoint == "generate":
+            return "POST", "/generate", {"json": {"ingredients": combos[index % len(combos)], "language": "en"}}
+        if endpoint == "stream":
+            return "POST", "/generate/stream", {"json": {"ingredients": combos[index % len(combos)], "language": "en"}}
+        if endpoint == "image":
+            data = images[index % len(images)]
+            return "POST", "/generate-from-image", {"files": {"file": ("dish.jpg", data, "image/jpeg")}}
+        # Distinct text per request defeats the PDF cache unless --distinct is small
+        text = f"{recipe}\n\nVariant {index % args.distinct}"
+        return "POST", "/download-recipe-pdf", {"json": {"recipe": text, "language": "en"}}
+
+    return build
+
+
+async def run_endpoint(client, recorder, endpoint, args):
+    build = request_factory(endpoint, args)
+    latencies = LatencyWindow(size=args.requests)
+    first_byte = LatencyWindow(size=args.requests)
+    statuses = {}
+    queue = iter(range(args.requests))
+
+    async def worker():
+        for index in queue:
+            method, url, kwargs = build(index)
+            request_id = f"{endpoint}-{index}"
+            started = time.perf_counter()
+            response = await client.request(method, url, headers={"x-bench-id": request_id}, **kwargs)
+            await response.aread()
+            latencies.observe((time.perf_counter() - started) * 1000)
+            first_byte_at = recorder.first_byte.pop(request_id, None)
+            if first_byte_at is not None:
+                first_byte.observe((first_byte_at - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 300)
+    return {
+        "endpoint": endpoint,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 2),
+        "rps": round(args.requests / elapsed, 1),
+        "statuses": statuses,
+        "error_rate": round(errors / args.requests, 4),
+        **latencies.stats(),
+        **{f"ttfb_{key}": value for key, value in first_byte.stats().items() if key != "count"},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def main(args):
+    fake = install(FakeModel(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        token_delay=args.token_delay, recipe_sections=args.recipe_sections, seed=args.seed,
+    ))
+    endpoints = ["generate", "stream", "image", "pdf"] if args.endpoint == "all" else [args.endpoint]
+    recorder = FirstByteRecorder(app)
+    transport = httpx.ASGITransport(app=recorder)
+    failed = []
+    # The PDF POST answers 303 to its GET URL, so follow redirects like a browser
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None, follow_redirects=True
+    ) as client:
+        for endpoint in endpoints:
+            report = await run_endpoint(client, recorder, endpoint, args)
+            print(" ".join(f"{key}={value}" for key, value in report.items()))
+            if report["error_rate"] > args.max_error_rate:
+                failed.append(f"{endpoint} ({report['error_rate']:.0%} non-2xx)")
+    print(f"fake_model_calls={fake.calls} fake_stream_calls={fake.stream_calls}")
+    if failed:
+        # Latency numbers for a mostly failing endpoint measure the error path
+        sys.exit("error rate above --max-error-rate for: " + ", ".join(failed))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoint", choices=["generate", "stream", "image", "pdf", "all"], default="all")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=10_000,
+                        help="distinct payloads; lower it to exercise the caches "
+                             f"(image runs use at most {MAX_SAMPLE_IMAGES} distinct images)")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Gemini latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="delay between streamed chunks")
+    parser.add_argument("--recipe-sections", type=int, default=6)
+    parser.add_argument("--image-size", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-error-rate", type=float, default=0.05,
+                        help="exit non-zero if an endpoint's non-2xx share exceeds this")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,33 @@
+"""Microbenchmarks for clean_markdown and generate_recipe_pdf on large recipes.
+
+    python -m benchmarks.microbench --sections 40 --repeat 20
+"""
+import argparse
+import timeit
+
+from app.pdf_generator import clean_markdown, generate_recipe_pdf
+from benchmarks.fake_gemini import fake_recipe
+
+
+def bench(label, func, repeat, number):
+    timings = timeit.repeat(func, repeat=repeat, number=number)
+    per_call = [t / number * 1000 for t in timings]
+    print(f"{label}: best={min(per_call):.3f}ms median={sorted(per_call)[len(per_call) // 2]:.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=40)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    recipe = fake_recipe(args.sections, args.lines)
+    recipe_data = {"recipe": recipe, "language": "en"}
+    print(f"recipe: {len(recipe)} chars, {recipe.count(chr(10)) + 1} lines")
+    bench("clean_markdown", lambda: clean_markdown(recipe), args.repeat, 100)
+    bench("generate_recipe_pdf", lambda: generate_recipe_pdf(recipe_data), args.repeat, 1)
+
+
+if __name__ == "__main__":
+    main()
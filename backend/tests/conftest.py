@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the backend the same way uvicorn does: as the top-level "app" package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
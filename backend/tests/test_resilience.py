@@ -0,0 +1,180 @@
+import asyncio
+import types
+
+import pytest
+
+from app.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientClient,
+    TokenBucket,
+    UpstreamUnavailableError,
+)
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"upstream {code}")
+        self.code = code
+
+
+class FakeModel:
+    """Fails with the queued errors first, then answers "ok" after delay seconds"""
+
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return types.SimpleNamespace(text="ok")
+
+
+def make_client(model, threshold=3, reset=60.0, **kwargs):
+    kwargs.setdefault("base_delay", 0.001)
+    kwargs.setdefault("max_delay", 0.002)
+    return ResilientClient(
+        lambda: model,
+        limiter=TokenBucket(rate=1000, capacity=1000),
+        breaker=CircuitBreaker(threshold, reset),
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("code", [429, 503])
+def test_retries_retryable_errors(code):
+    model = FakeModel([UpstreamError(code), UpstreamError(code)])
+    client = make_client(model)
+
+    response = asyncio.run(client.generate("prompt"))
+
+    assert response.text == "ok"
+    assert model.calls == 3
+    assert client.counters["retries"] == 2
+    assert client.breaker.state == "closed"
+
+
+def test_does_not_retry_non_retryable_errors():
+    model = FakeModel([UpstreamError(400)])
+    client = make_client(model)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(client.generate("prompt"))
+
+    assert model.calls == 1
+    assert client.counters["retries"] == 0
+    assert client.breaker.failures == 0
+
+
+def test_rate_limit_halves_limiter_rate():
+    client = make_client(FakeModel([UpstreamError(429)]))
+
+    asyncio.run(client.generate("prompt"))
+
+    assert client.limiter.rate < client.limiter.max_rate
+
+
+def test_timeouts_are_counted_and_retried():
+    client = make_client(FakeModel(delay=1.0), timeout=0.01, max_retries=1)
+
+    with pytest.raises(UpstreamUnavailableError):
+        asyncio.run(client.generate("prompt"))
+
+    assert client.counters["timeouts"] == 2
+    assert client.counters["retries"] == 1
+    assert client.counters["failures"] == 1
+
+
+def test_breaker_opens_fails_fast_and_probe_closes_it():
+    model = FakeModel([UpstreamError(503)] * 3)
+    client = make_client(model, threshold=3, reset=0.05, max_retries=5)
+
+    async def scenario():
+        with pytest.raises(CircuitOpenError) as opened:
+            await client.generate("prompt")
+        assert client.breaker.state == "open"
+        assert opened.value.retry_after > 0
+        calls_when_opened = model.calls
+
+        # Still open: fails fast without touching the upstream
+        with pytest.raises(CircuitOpenError):
+            await client.generate("prompt")
+        assert model.calls == calls_when_opened
+
+        # After the reset timeout a probe goes through and closes the breaker
+        await asyncio.sleep(0.06)
+        response = await client.generate("prompt")
+        assert response.text == "ok"
+        assert client.breaker.state == "closed"
+        assert model.calls == calls_when_opened + 1
+
+    asyncio.run(scenario())
+    assert client.counters["rejected"] == 2
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    asyncio.run(asyncio.sleep(0.02))
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one probe per reset window
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_non_retryable_answer_closes_half_open_breaker():
+    model = FakeModel([UpstreamError(400)])
+    client = make_client(model, threshold=1, reset=0.01)
+    client.breaker.record_failure()
+
+    async def scenario():
+        await asyncio.sleep(0.02)
+        with pytest.raises(UpstreamError):
+            await client.generate("prompt")
+        # The upstream answered, so the next call goes straight through
+        assert client.breaker.state == "closed"
+        response = await client.generate("prompt")
+        assert response.text == "ok"
+
+    asyncio.run(scenario())
+
+
+class StreamingModel:
+    """Streams the given chunks, raising any that are exceptions"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def generate_content_async(self, contents, stream=False, **kwargs):
+        async def chunks():
+            for chunk in self.chunks:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield types.SimpleNamespace(text=chunk)
+
+        return chunks()
+
+
+def test_stream_error_is_recorded_and_wrapped():
+    client = make_client(StreamingModel(["a", "b", UpstreamError(503)]), threshold=1)
+
+    async def scenario():
+        received = []
+        with pytest.raises(UpstreamUnavailableError):
+            async for chunk in client.stream("prompt"):
+                received.append(chunk.text)
+        return received
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    assert client.counters["failures"] == 1
+    assert client.breaker.state == "open"
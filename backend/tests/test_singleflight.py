@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "recipe"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", upstream) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["recipe"] * 5
+    assert calls == 1
+    assert flight.stats()["collapsed"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("key", upstream) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["failures"] == 1
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "recipe"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("key", upstream))
+        second = asyncio.ensure_future(flight.do("key", upstream))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "recipe"
+    assert calls == 1
+
+
+def test_last_waiter_cancelling_cancels_the_call():
+    flight = SingleFlight()
+    finished = False
+
+    async def upstream():
+        nonlocal finished
+        await asyncio.sleep(0.05)
+        finished = True
+
+    async def scenario():
+        waiter = asyncio.ensure_future(flight.do("key", upstream))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    assert not finished
+    assert flight.stats()["in_flight"] == 0